@@ -1,19 +1,59 @@
 import logging
 import os
-import json
 import asyncio
+import hashlib
+import io
 import math
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
+
+# O paralelismo interno (OpenMP) do Tesseract só atrapalha em imagens pequenas;
+# o paralelismo vem do pool de processos de OCR. Precisa ser definido antes de
+# carregar a libtesseract.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import folium
+from folium.plugins import FastMarkerCluster
+import numpy as np
+import orjson
 from PIL import Image
-import pytesseract
+from PIL.ExifTags import GPS, IFD, Base
+from tesserocr import OEM, PSM, PyTessBaseAPI
 import re
 
-from telegram import Update
+from telegram import InputFile, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
 # Configuração do Tesseract
-pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'
+# Cada processo do pool de OCR mantém a sua própria API do Tesseract, criada uma
+# única vez: os modelos de idioma são carregados uma vez por processo e cada OCR
+# é uma chamada direta à libtesseract.
+TESSDATA_PATH = os.environ.get("TESSDATA_PREFIX", "/usr/share/tesseract-ocr/5/tessdata")
+# Em containers (Render, Railway) os.cpu_count() devolve os núcleos da máquina,
+# não a cota do container, e cada processo carrega seus próprios modelos: o
+# número de processos vem do ambiente, com um padrão pequeno.
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", min(2, os.cpu_count() or 1)))
+# O carimbo é em português e o resto são dígitos e letras de direção: um único
+# modelo basta, e cada idioma a mais é mais um reconhecedor rodando por imagem
+OCR_LANG = os.environ.get("OCR_LANG", "por")
+_TESS_API = None
+
+# O Tesseract escala com o número de pixels: a foto é reduzida antes do OCR e a
+# primeira tentativa lê só a faixa inferior, onde fica o carimbo do GPS Map Camera.
+# OCR_OVERLAY_TOP é a fração da altura onde a faixa começa.
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "2000"))
+OCR_OVERLAY_TOP = float(os.environ.get("OCR_OVERLAY_TOP", "0.6"))
+# Tentativas de OCR, em ordem: (só a faixa do carimbo?, modo de segmentação).
+# A faixa é um bloco único de texto e dispensa a análise de layout; na imagem
+# inteira, a última tentativa procura texto esparso em qualquer posição.
+OCR_ATTEMPTS = (
+    (True, PSM.SINGLE_BLOCK),
+    (False, PSM.AUTO),
+    (False, PSM.SPARSE_TEXT),
+)
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -23,12 +63,71 @@ logger = logging.getLogger(__name__)
 # ID do grupo FDA Relatorios
 RELATORIO_GROUP_ID = -5078417185
 
-# Arquivo para armazenar coordenadas
-COORDS_FILE = "coordenadas.json"
+# Arquivo para armazenar coordenadas (JSONL: um ponto por linha, só com acréscimos)
+COORDS_FILE = "coordenadas.jsonl"
+LEGACY_COORDS_FILE = "coordenadas.json"
 MAPA_FILE = "mapa.html"
 
+# Marcador de cada foto no mapa, montado no navegador a partir da linha
+# [latitude, longitude, cor, popup, tooltip] passada ao FastMarkerCluster
+MAP_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'camera', prefix: 'fa', markerColor: row[2], iconColor: 'white'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[3]);
+    marker.bindTooltip(row[4]);
+    return marker;
+}
+"""
+
 # Variáveis globais para controlar o delay de geração de mapa
 mapa_timer = None
+# Último mapa gerado, o número de coordenadas que ele cobre e quantas delas
+# aparecem no mapa; como a lista só cresce, o mesmo número significa o mesmo mapa
+_map_cache = {"n": 0, "html": None, "pontos": 0}
+# Uma geração de mapa por vez: se outra for pedida no meio, ela é marcada como
+# pendente e a geração em andamento roda mais uma vez ao terminar
+_map_state = {"running": False, "dirty": False}
+
+# Coordenadas em memória: o arquivo JSON só é lido na primeira consulta.
+# As somas das coordenadas com cliente dão o centro do mapa sem percorrer a lista.
+_coords_cache: list | None = None
+_coords_stats = {"sum_lat": 0.0, "sum_lon": 0.0, "n": 0}
+# Índice espacial de deduplicação: célula de 0,0001° (latitude e longitude na 4ª
+# casa decimal) + timestamp -> coordenadas gravadas nessa célula
+_coords_index: dict = {}
+
+# Cache dos resultados de OCR, indexado pelo file_unique_id do Telegram e pelo
+# hash do conteúdo da imagem. É salvo em disco no desligamento do bot para que
+# um reinício não precise refazer o OCR das fotos já vistas.
+OCR_CACHE_SIZE = 1024
+OCR_CACHE_FILE = "ocr_cache.json"
+_ocr_cache: OrderedDict = OrderedDict()
+
+# Padrões procurados no texto do OCR
+# Coordenadas no formato -6,6386S -51,9896W: parte inteira e decimal de cada eixo
+# já separadas em grupos, prontas para a conversão
+COORD_RE = re.compile(r'(-?\d+)[\.,](\d+)[NSns]\s+(-?\d+)[\.,](\d+)[EWLOwvloe]', re.IGNORECASE)
+# Sem nenhuma dessas letras no texto, COORD_RE não tem como casar
+COORD_HEMISPHERE_CHARS = frozenset('NSns')
+# Data/hora nos dois formatos do carimbo, numa única passada pelo texto:
+# 'DD de Mês de AAAA HH:MM[:SS]' ou 'DD/MM/AAAA HH:MM[:SS]'
+DATETIME_RE = re.compile(
+    r'(?P<day>\d{1,2})\s*(?:de\s*)?(?P<month>[a-z]{3,})\.?\s*(?:de\s*)?(?P<year>\d{4})\s*.*?'
+    r'(?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?'
+    r'|(?P<day2>\d{2})/(?P<month2>\d{2})/(?P<year2>\d{4})\s*'
+    r'(?P<hour2>\d{2}):(?P<minute2>\d{2})(?::(?P<second2>\d{2}))?',
+    re.IGNORECASE,
+)
+MONTH_MAP = {
+    'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12
+}
+DENOV_RE = re.compile(r'denov', re.IGNORECASE)
+# Tag de cliente #Oia NomeCliente. O OCR às vezes lê:
+# - # como t (tóia em vez de #oia)
+# - O como 0 (zero) (#0ia em vez de #Oia)
+TAG_RE = re.compile(r'[#t][O0]ia\s+(\w+)', re.IGNORECASE)
 
 # ============================================================================
 # CONFIGURAÇÃO DE CLIENTES E GEOFENCES
@@ -73,42 +172,50 @@ CLIENTES_OURILANDIA = {
     }
 }
 
+# Os mesmos dados em arrays, na ordem do dicionário, para calcular a distância
+# até todos os clientes de uma vez
+METROS_POR_GRAU = 6371000 * math.pi / 180
+_CLIENT_NAMES = list(CLIENTES_OURILANDIA)
+_CLIENT_LATS = np.array([c["latitude"] for c in CLIENTES_OURILANDIA.values()])
+_CLIENT_LONS = np.array([c["longitude"] for c in CLIENTES_OURILANDIA.values()])
+_CLIENT_RADII = np.array([c["raio_metros"] for c in CLIENTES_OURILANDIA.values()])
+# Meia largura, em graus, do quadrado que contém cada geofence (a longitude
+# encolhe com o cosseno da latitude, então vale para os dois eixos)
+_CLIENT_BOX_DEG = _CLIENT_RADII / (METROS_POR_GRAU * np.cos(np.radians(_CLIENT_LATS)))
+
 # ============================================================================
 # FUNÇÕES DE GEOFENCE
 # ============================================================================
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Calcula a distância em metros entre dois pontos usando a fórmula de Haversine.
-    """
-    R = 6371000  # Raio da Terra em metros
-    
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
-
 def find_cliente_by_geofence(latitude: float, longitude: float) -> str | None:
     """
     Encontra o cliente baseado na geofence (500 metros).
     Retorna o nome do cliente ou None se não encontrar.
     """
-    for cliente_name, cliente_info in CLIENTES_OURILANDIA.items():
-        distancia = haversine_distance(
-            latitude, longitude,
-            cliente_info["latitude"], cliente_info["longitude"]
-        )
-        
-        if distancia <= cliente_info["raio_metros"]:
-            logger.info(f"Coordenada {latitude}, {longitude} pertence a {cliente_name} (distância: {distancia:.2f}m)")
-            return cliente_name
+    delta_lat = _CLIENT_LATS - latitude
+    delta_lon = _CLIENT_LONS - longitude
+    
+    # Descarte rápido: a maioria dos pontos não está perto de nenhum cliente
+    candidatos = (np.abs(delta_lat) <= _CLIENT_BOX_DEG) & (np.abs(delta_lon) <= _CLIENT_BOX_DEG)
+    if not candidatos.any():
+        logger.warning("Coordenada %s, %s não pertence a nenhum cliente", latitude, longitude)
+        return None
+    
+    # Para raios de centenas de metros a aproximação equirretangular erra
+    # menos de 0,1 m em relação à Haversine e usa um único cosseno
+    dy = delta_lat * METROS_POR_GRAU
+    dx = delta_lon * (METROS_POR_GRAU * math.cos(math.radians(latitude)))
+    distancias = np.sqrt(dx * dx + dy * dy)
+    
+    # As geofences se sobrepõem: vale o primeiro cliente da lista que contém o ponto
+    dentro = candidatos & (distancias <= _CLIENT_RADII)
+    if dentro.any():
+        idx = int(dentro.argmax())
+        cliente_name = _CLIENT_NAMES[idx]
+        logger.info("Coordenada %s, %s pertence a %s (distância: %.2fm)", latitude, longitude, cliente_name, distancias[idx])
+        return cliente_name
     
-    logger.warning(f"Coordenada {latitude}, {longitude} não pertence a nenhum cliente")
+    logger.warning("Coordenada %s, %s não pertence a nenhum cliente", latitude, longitude)
     return None
 
 # ============================================================================
@@ -120,15 +227,11 @@ def extract_client_tag(text: str) -> list[str]:
     Extrai tags de cliente do formato #Oia NomeCliente.
     Retorna uma lista de clientes encontrados.
     """
-    # Procura por padrão: #Oia NomeCliente ou variações
-    # O OCR às vezes lê:
-    # - # como t (tóia em vez de #oia)
-    # - O como 0 (zero) (#0ia em vez de #Oia)
-    pattern = r'[#t][O0]ia\s+(\w+)'
-    matches = re.findall(pattern, text, re.IGNORECASE)
+    # Procura por padrão: #Oia NomeCliente ou variações (ver TAG_RE)
+    matches = TAG_RE.findall(text)
     
     if matches:
-        logger.info(f"Tags encontradas: {matches}")
+        logger.info("Tags encontradas: %s", matches)
     
     return matches
 
@@ -146,39 +249,149 @@ def validate_client_tag(tag: str) -> bool:
 # ============================================================================
 
 def load_coordinates() -> list:
-    """Carrega as coordenadas do arquivo JSON."""
-    if os.path.exists(COORDS_FILE):
-        try:
-            with open(COORDS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Erro ao carregar coordenadas: {e}")
-            return []
-    return []
+    """Retorna as coordenadas em memória, carregando o arquivo JSON na primeira chamada."""
+    global _coords_cache
+    if _coords_cache is None:
+        _coords_cache = read_coordinates_file()
+        migrated = False
+        for coord in _coords_cache:
+            timestamp = normalize_timestamp(coord["timestamp"])
+            if timestamp != coord["timestamp"]:
+                coord["timestamp"] = timestamp
+                migrated = True
+            update_coords_stats(coord)
+            index_coordinate(coord["latitude"], coord["longitude"], coord["timestamp"])
+        # Regrava uma única vez o arquivo que ainda tinha timestamps no formato antigo
+        if migrated:
+            save_coordinates(_coords_cache)
+    return _coords_cache
+
+def normalize_timestamp(timestamp: str) -> str:
+    """Converte um timestamp antigo 'DD/MM/AAAA HH:MM:SS' para ISO 8601 (AAAA-MM-DDTHH:MM:SS)."""
+    if '/' not in timestamp:
+        return timestamp
+    try:
+        return datetime.strptime(timestamp, '%d/%m/%Y %H:%M:%S').isoformat(timespec='seconds')
+    except ValueError:
+        logger.warning("Timestamp em formato desconhecido mantido como está: %s", timestamp)
+        return timestamp
+
+def format_timestamp(timestamp: str) -> str:
+    """Formata o timestamp ISO 8601 gravado como 'DD/MM/AAAA HH:MM:SS' para exibição."""
+    try:
+        return datetime.fromisoformat(timestamp).strftime('%d/%m/%Y %H:%M:%S')
+    except ValueError:
+        return timestamp
+
+def coordinate_key(latitude: float, longitude: float, timestamp: str) -> tuple:
+    """Chave do índice de deduplicação: coordenadas arredondadas para ~10 m e o horário."""
+    return round(latitude * 10000), round(longitude * 10000), timestamp
+
+def index_coordinate(latitude: float, longitude: float, timestamp: str) -> None:
+    """Registra a coordenada no índice de deduplicação."""
+    _coords_index.setdefault(coordinate_key(latitude, longitude, timestamp), []).append((latitude, longitude))
+
+def update_coords_stats(coord: dict) -> None:
+    """Acumula a coordenada nas somas usadas para o centro do mapa."""
+    if coord.get("cliente"):
+        _coords_stats["sum_lat"] += coord["latitude"]
+        _coords_stats["sum_lon"] += coord["longitude"]
+        _coords_stats["n"] += 1
+
+def read_coordinates_file() -> list:
+    """Carrega as coordenadas do arquivo JSONL, migrando o antigo arquivo JSON se preciso."""
+    if not os.path.exists(COORDS_FILE):
+        return migrate_legacy_coordinates()
+    
+    coords_list = []
+    try:
+        with open(COORDS_FILE, 'rb') as f:
+            data = f.read()
+        
+        # Toda gravação termina em '\n': o que vem depois do último é o resto de
+        # uma gravação interrompida (ex.: queda do processo)
+        complete, _, tail = data.rpartition(b'\n')
+        for line_number, line in enumerate(complete.split(b'\n'), 1):
+            if not line.strip():
+                continue
+            try:
+                coords_list.append(orjson.loads(line))
+            except ValueError:
+                logger.warning("Linha %s inválida em %s, ignorada", line_number, COORDS_FILE)
+        
+        if tail.strip():
+            # O fim do arquivo precisa ser reparado antes da próxima gravação em
+            # modo 'ab', senão ela fica colada na linha interrompida
+            try:
+                coords_list.append(orjson.loads(tail))
+                with open(COORDS_FILE, 'ab') as f:
+                    f.write(b'\n')
+                logger.warning("Última linha de %s sem quebra de linha, completada", COORDS_FILE)
+            except ValueError:
+                os.truncate(COORDS_FILE, len(data) - len(tail))
+                logger.warning("Última linha de %s incompleta, descartada", COORDS_FILE)
+    except Exception as e:
+        logger.error("Erro ao carregar coordenadas: %s", e)
+        return []
+    return coords_list
+
+def migrate_legacy_coordinates() -> list:
+    """Converte o antigo coordenadas.json (uma lista JSON) para o formato JSONL."""
+    if not os.path.exists(LEGACY_COORDS_FILE):
+        return []
+    try:
+        with open(LEGACY_COORDS_FILE, 'rb') as f:
+            coords_list = orjson.loads(f.read())
+    except Exception as e:
+        logger.error("Erro ao carregar coordenadas: %s", e)
+        return []
+    
+    if save_coordinates(coords_list):
+        logger.info("%s migrado para %s", LEGACY_COORDS_FILE, COORDS_FILE)
+    return coords_list
 
 def save_coordinates(coords_list: list) -> bool:
-    """Salva as coordenadas no arquivo JSON."""
+    """Reescreve o arquivo JSONL com todas as coordenadas."""
     try:
-        with open(COORDS_FILE, 'w') as f:
-            json.dump(coords_list, f, indent=2, ensure_ascii=False)
-        logger.info(f"Coordenadas salvas: {len(coords_list)} pontos")
+        with open(COORDS_FILE, 'wb') as f:
+            f.writelines(orjson.dumps(coord) + b'\n' for coord in coords_list)
+        logger.info("Coordenadas salvas: %s pontos", len(coords_list))
         return True
     except Exception as e:
-        logger.error(f"Erro ao salvar coordenadas: {e}")
+        logger.error("Erro ao salvar coordenadas: %s", e)
+        return False
+
+def append_coordinate(coord: dict) -> bool:
+    """Acrescenta uma coordenada ao final do arquivo JSONL, sem reescrever os demais pontos."""
+    size = None
+    try:
+        with open(COORDS_FILE, 'ab') as f:
+            size = f.tell()
+            f.write(orjson.dumps(coord) + b'\n')
+        return True
+    except Exception as e:
+        logger.error("Erro ao salvar coordenada: %s", e)
+        # Desfaz a gravação parcial para a próxima não ficar colada nela
+        if size is not None:
+            try:
+                os.truncate(COORDS_FILE, size)
+            except OSError:
+                pass
         return False
 
 def coordinate_exists(latitude: float, longitude: float, timestamp: str) -> bool:
     """Verifica se uma coordenada já existe (deduplicação)."""
-    coords_list = load_coordinates()
+    load_coordinates()
     
-    for coord in coords_list:
-        lat_match = abs(coord["latitude"] - latitude) < 0.0001
-        lon_match = abs(coord["longitude"] - longitude) < 0.0001
-        time_match = coord["timestamp"] == timestamp
-        
-        if lat_match and lon_match and time_match:
-            logger.info(f"Coordenada duplicada detectada: {latitude}, {longitude} em {timestamp}")
-            return True
+    # Pontos a menos de 0,0001° caem na mesma célula ou numa vizinha: basta olhar
+    # as 9 células em volta e confirmar a tolerância nas coordenadas gravadas
+    cell_lat, cell_lon, _ = coordinate_key(latitude, longitude, timestamp)
+    for d_lat in (-1, 0, 1):
+        for d_lon in (-1, 0, 1):
+            for lat, lon in _coords_index.get((cell_lat + d_lat, cell_lon + d_lon, timestamp), ()):
+                if abs(lat - latitude) < 0.0001 and abs(lon - longitude) < 0.0001:
+                    logger.info("Coordenada duplicada detectada: %s, %s em %s", latitude, longitude, timestamp)
+                    return True
     
     return False
 
@@ -195,39 +408,45 @@ def add_coordinate(latitude: float, longitude: float, timestamp: str, cliente: s
         "longitude": longitude,
         "timestamp": timestamp,
         "cliente": cliente,
-        "id": len(coords_list) + 1
+        # Segue o último id: linhas inválidas descartadas não podem gerar ids repetidos
+        "id": coords_list[-1].get("id", len(coords_list)) + 1 if coords_list else 1
     }
     
+    # Só entra na memória depois de gravado, para não divergir do arquivo
+    if not append_coordinate(new_coord):
+        return False
     coords_list.append(new_coord)
-    return save_coordinates(coords_list)
+    update_coords_stats(new_coord)
+    index_coordinate(latitude, longitude, timestamp)
+    return True
 
 # ============================================================================
 # FUNÇÕES DE MAPA
 # ============================================================================
 
-def generate_map() -> bool:
-    """Gera um mapa interativo com Folium com todas as coordenadas agrupadas por cliente."""
+def generate_map(coords_list: list, coords_stats: dict) -> tuple[int, bytes] | None:
+    """
+    Gera um mapa interativo com Folium com todas as coordenadas agrupadas por cliente.
+    Roda no processo de mapas, por isso recebe as coordenadas e as somas do centro
+    em vez de ler o estado do bot.
+    Retorna o número de pontos no mapa e o HTML, gerado direto em memória,
+    ou None se não houver mapa.
+    """
     try:
-        import folium
-        
-        coords_list = load_coordinates()
-        
         if not coords_list:
             logger.warning("Nenhuma coordenada para gerar mapa")
-            return False
+            return None
         
         # Filtra apenas coordenadas com cliente definido
         coords_com_cliente = [c for c in coords_list if c.get("cliente")]
         
         if not coords_com_cliente:
             logger.warning("Nenhuma coordenada com cliente para gerar mapa")
-            return False
+            return None
         
-        # Calcula o centro do mapa
-        lats = [c["latitude"] for c in coords_com_cliente]
-        lons = [c["longitude"] for c in coords_com_cliente]
-        center_lat = sum(lats) / len(lats)
-        center_lon = sum(lons) / len(lons)
+        # Calcula o centro do mapa a partir das somas mantidas em memória
+        center_lat = coords_stats["sum_lat"] / coords_stats["n"]
+        center_lon = coords_stats["sum_lon"] / coords_stats["n"]
         
         # Cria o mapa com OpenStreetMap
         mapa = folium.Map(
@@ -237,12 +456,13 @@ def generate_map() -> bool:
         )
         
         # Agrupa coordenadas por cliente
-        coords_por_cliente = {}
+        coords_por_cliente = defaultdict(list)
         for coord in coords_com_cliente:
-            cliente = coord.get("cliente")
-            if cliente not in coords_por_cliente:
-                coords_por_cliente[cliente] = []
-            coords_por_cliente[cliente].append(coord)
+            coords_por_cliente[coord["cliente"]].append(coord)
+        
+        # Fotos de todos os clientes vão como uma única lista de dados para o
+        # FastMarkerCluster, que cria os marcadores no navegador
+        pontos = []
         
         # Adiciona marcadores para cada cliente
         for cliente_name, coords in coords_por_cliente.items():
@@ -269,47 +489,83 @@ def generate_map() -> bool:
                     icon=folium.Icon(color=cor, icon="star", prefix="fa")
                 ).add_to(mapa)
                 
-                # Adiciona marcadores das fotos
+                # Adiciona os pontos das fotos
                 for coord in coords:
-                    folium.Marker(
-                        location=[coord["latitude"], coord["longitude"]],
-                        popup=f"<b>{cliente_name}</b><br>ID: {coord['id']}<br>Data: {coord['timestamp']}<br>Lat: {coord['latitude']:.6f}<br>Lon: {coord['longitude']:.6f}",
-                        tooltip=f"{cliente_name} - {coord['timestamp']}",
-                        icon=folium.Icon(color=cor, icon="camera", prefix="fa")
-                    ).add_to(mapa)
+                    data = format_timestamp(coord["timestamp"])
+                    pontos.append([
+                        coord["latitude"],
+                        coord["longitude"],
+                        cor,
+                        f"<b>{cliente_name}</b><br>ID: {coord['id']}<br>Data: {data}<br>Lat: {coord['latitude']:.6f}<br>Lon: {coord['longitude']:.6f}",
+                        f"{cliente_name} - {data}",
+                    ])
+        
+        FastMarkerCluster(pontos, callback=MAP_MARKER_CALLBACK).add_to(mapa)
         
         # Adiciona legenda
-        legend_html = '''
+        legend_parts = ['''
         <div style="position: fixed; 
                     bottom: 50px; right: 50px; width: 280px; height: auto; 
                     background-color: white; border:2px solid grey; z-index:9999; 
                     font-size:13px; padding: 12px; border-radius: 5px;">
             <b style="font-size: 14px;">Clientes - Ourilândia</b><br>
             <hr style="margin: 5px 0;">
-        '''
+        ''']
         
         for cliente_name, coords in sorted(coords_por_cliente.items()):
             cor = CLIENTES_OURILANDIA[cliente_name]["cor"]
             contagem = len(coords)
-            legend_html += f'<div style="margin: 5px 0;"><i style="background:{cor}; width: 16px; height: 16px; display: inline-block; border-radius: 50%; border: 1px solid black;"></i> <b>{cliente_name}</b>: {contagem} foto(s)</div>'
+            legend_parts.append(f'<div style="margin: 5px 0;"><i style="background:{cor}; width: 16px; height: 16px; display: inline-block; border-radius: 50%; border: 1px solid black;"></i> <b>{cliente_name}</b>: {contagem} foto(s)</div>')
         
-        legend_html += '</div>'
+        legend_parts.append('</div>')
+        legend_html = "".join(legend_parts)
         
         mapa.get_root().html.add_child(folium.Element(legend_html))
         
-        # Salva como HTML
-        mapa.save(MAPA_FILE)
-        logger.info(f"Mapa HTML gerado: {MAPA_FILE} com {len(coords_com_cliente)} pontos")
-        return True
+        # Renderiza o HTML em memória; o arquivo é enviado sem passar pelo disco
+        html = mapa.get_root().render().encode('utf-8')
+        logger.info("Mapa HTML gerado com %s pontos", len(coords_com_cliente))
+        return len(coords_com_cliente), html
     
-    except ImportError:
-        logger.error("Folium não está instalado")
-        return False
     except Exception as e:
-        logger.error(f"Erro ao gerar mapa: {e}")
+        logger.error("Erro ao gerar mapa: %s", e)
         import traceback
         traceback.print_exc()
-        return False
+        return None
+
+# A montagem do mapa com Folium é Python puro e seguraria o GIL do bot: roda
+# num processo à parte, um mapa por vez
+MAP_EXECUTOR = ProcessPoolExecutor(max_workers=1)
+
+async def render_map() -> tuple[int, bytes] | None:
+    """Gera o mapa no processo de mapas, reaproveitando o último se nada mudou."""
+    global MAP_EXECUTOR
+    coords_list = load_coordinates()
+    n = len(coords_list)
+    if _map_cache["html"] is not None and _map_cache["n"] == n:
+        logger.info("Coordenadas inalteradas, reaproveitando o último mapa")
+        return _map_cache["pontos"], _map_cache["html"]
+    
+    # Cópias tiradas agora: novas fotos podem chegar enquanto o mapa é gerado
+    executor = MAP_EXECUTOR
+    loop = asyncio.get_running_loop()
+    try:
+        mapa = await loop.run_in_executor(executor, generate_map, coords_list[:n], dict(_coords_stats))
+    except BrokenProcessPool as e:
+        # O processo de mapas morreu (ex.: falta de memória): o pool não se
+        # recupera sozinho, então é trocado por um novo para os próximos mapas
+        logger.error("Processo de mapas encerrado (%s), recriando o pool", e)
+        if MAP_EXECUTOR is executor:
+            MAP_EXECUTOR = ProcessPoolExecutor(max_workers=1)
+            executor.shutdown(wait=False)
+        return None
+    except Exception as e:
+        logger.error("Erro ao gerar mapa: %s", e)
+        return None
+    if mapa is not None:
+        _map_cache["n"] = n
+        _map_cache["pontos"], _map_cache["html"] = mapa
+    return mapa
 
 async def schedule_map_generation(context: ContextTypes.DEFAULT_TYPE, delay: int = 60):
     """Agenda a geração de mapa com delay de 60 segundos."""
@@ -319,110 +575,240 @@ async def schedule_map_generation(context: ContextTypes.DEFAULT_TYPE, delay: int
         mapa_timer.cancel()
         logger.info("Timer anterior cancelado")
     
-    logger.info(f"Agendando geração de mapa em {delay} segundos...")
+    logger.info("Agendando geração de mapa em %s segundos...", delay)
     
     async def send_map_after_delay():
         await asyncio.sleep(delay)
         logger.info("Gerando mapa após delay de 60 segundos...")
-        
-        if generate_map() and os.path.exists(MAPA_FILE):
-            try:
-                coords_list = load_coordinates()
-                coords_com_cliente = [c for c in coords_list if c.get("cliente")]
-                
-                with open(MAPA_FILE, 'rb') as mapa_file:
+        # Passado o delay, uma nova foto cancela só a espera, não o envio
+        await asyncio.shield(generate_and_send_map(context))
+    
+    mapa_timer = asyncio.create_task(send_map_after_delay())
+
+async def generate_and_send_map(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Gera o mapa fora do processo do bot e envia para o grupo de relatórios."""
+    if _map_state["running"]:
+        logger.info("Geração de mapa em andamento, nova geração fica pendente")
+        _map_state["dirty"] = True
+        return
+    
+    _map_state["running"] = True
+    try:
+        while True:
+            _map_state["dirty"] = False
+            mapa = await render_map()
+            if mapa is not None:
+                pontos, html = mapa
+                try:
                     await context.bot.send_document(
                         chat_id=RELATORIO_GROUP_ID,
-                        document=mapa_file,
+                        document=InputFile(html, filename=MAPA_FILE),
                         caption=f"🗺️ Mapa Ourilândia Atualizado!\n\n"
-                                f"📊 Total de pontos: {len(coords_com_cliente)}\n"
+                                f"📊 Total de pontos: {pontos}\n"
                                 f"⏰ Atualizado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
                     )
-                logger.info("Mapa enviado para o grupo de relatórios")
-            except Exception as e:
-                logger.error(f"Erro ao enviar mapa para o grupo: {e}")
-    
-    mapa_timer = asyncio.create_task(send_map_after_delay())
+                    logger.info("Mapa enviado para o grupo de relatórios")
+                except Exception as e:
+                    logger.error("Erro ao enviar mapa para o grupo: %s", e)
+            if not _map_state["dirty"]:
+                break
+    finally:
+        _map_state["running"] = False
 
 # ============================================================================
 # FUNÇÕES DE OCR E PROCESSAMENTO
 # ============================================================================
 
-def preprocess_image_for_ocr(image_path: str) -> Image.Image:
-    """Abre a imagem sem pré-processamento agressivo."""
-    img = Image.open(image_path)
-    return img
+def preprocess_image_for_ocr(img: Image.Image) -> Image.Image:
+    """Converte a imagem para tons de cinza, reduzida ao tamanho que o OCR precisa."""
+    # Em JPEG, o libjpeg já decodifica em tons de cinza e na menor escala (1/2, 1/4, 1/8)
+    # que ainda cobre o tamanho final; o thumbnail só completa a redução
+    scale = min(1, OCR_MAX_SIDE / max(img.size))
+    img.draft('L', (int(img.width * scale), int(img.height * scale)))
+    img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.Resampling.BILINEAR)
+    return img.convert('L')
+
+def overlay_band_rect(img: Image.Image) -> tuple[int, int, int, int]:
+    """Retângulo (esquerda, topo, largura, altura) da faixa inferior, onde fica o carimbo."""
+    top = int(img.height * OCR_OVERLAY_TOP)
+    return 0, top, img.width, img.height - top
+
+def _init_ocr_worker() -> None:
+    """Inicializa a API do Tesseract do processo de OCR."""
+    global _TESS_API
+    _TESS_API = PyTessBaseAPI(path=TESSDATA_PATH, lang=OCR_LANG, oem=OEM.LSTM_ONLY)
+
+OCR_EXECUTOR = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_init_ocr_worker)
+
+def _ocr_worker_ready() -> bool:
+    """Tarefa vazia usada para subir os processos de OCR antes da primeira foto."""
+    return _TESS_API is not None
+
+def set_ocr_image(image: Image.Image) -> None:
+    """Carrega a imagem na API do Tesseract do processo atual, uma vez por foto."""
+    _TESS_API.SetImage(image)
+
+def clear_ocr_image() -> None:
+    """Descarta a imagem e os resultados da API do Tesseract ao fim de cada foto."""
+    _TESS_API.Clear()
+
+def extract_text_from_image(rect: tuple[int, int, int, int], psm: int = PSM.AUTO) -> str:
+    """Executa o OCR num retângulo (esquerda, topo, largura, altura) da imagem carregada."""
+    _TESS_API.SetPageSegMode(psm)
+    # SetRectangle também descarta o reconhecimento anterior, então o novo PSM vale
+    _TESS_API.SetRectangle(*rect)
+    return _TESS_API.GetUTF8Text()
+
+def get_cached_ocr_result(key: str) -> tuple | None:
+    """Retorna o resultado de OCR em cache para a imagem, se existir."""
+    result = _ocr_cache.get(key)
+    if result is not None:
+        _ocr_cache.move_to_end(key)
+    return result
+
+def cache_ocr_result(key: str, result: tuple) -> None:
+    """Guarda o resultado de OCR no cache, descartando o mais antigo quando cheio."""
+    _ocr_cache[key] = result
+    _ocr_cache.move_to_end(key)
+    if len(_ocr_cache) > OCR_CACHE_SIZE:
+        _ocr_cache.popitem(last=False)
+
+def load_ocr_cache() -> None:
+    """Carrega o cache de OCR salvo no último desligamento, se existir."""
+    if not os.path.exists(OCR_CACHE_FILE):
+        return
+    try:
+        with open(OCR_CACHE_FILE, 'rb') as f:
+            entries = orjson.loads(f.read())
+        for key, dt_text, coords_str, latitude, longitude, tags in entries[-OCR_CACHE_SIZE:]:
+            dt_object = datetime.fromisoformat(dt_text) if dt_text else None
+            _ocr_cache[key] = (dt_object, coords_str, latitude, longitude, tags)
+    except Exception as e:
+        logger.error("Erro ao carregar o cache de OCR: %s", e)
+        return
+    logger.info("Cache de OCR carregado com %s entradas", len(_ocr_cache))
+
+def save_ocr_cache() -> None:
+    """Salva o cache de OCR em disco, do mais antigo para o mais recente."""
+    try:
+        with open(OCR_CACHE_FILE, 'wb') as f:
+            f.write(orjson.dumps([[key, *result] for key, result in _ocr_cache.items()]))
+    except Exception as e:
+        logger.error("Erro ao salvar o cache de OCR: %s", e)
+        return
+    logger.info("Cache de OCR salvo com %s entradas", len(_ocr_cache))
 
 def clean_ocr_text(text: str) -> str:
     """Limpa o texto extraído pelo OCR."""
-    text = re.sub(r'denov', 'de nov', text, flags=re.IGNORECASE)
+    text = DENOV_RE.sub('de nov', text)
     return text
 
-def parse_coordinates(coords_str: str) -> tuple[float, float] | None:
-    """Processa coordenadas GPS no formato: -6,6386S -51,9896W"""
-    try:
-        parts = coords_str.strip().split()
-        if len(parts) != 2:
-            logger.error(f"Formato de coordenadas inválido: {coords_str}")
-            return None
-        
-        lat_str, lon_str = parts
-        
-        lat_str = lat_str.replace(',', '.').replace('S', '').replace('N', '')
-        latitude = float(lat_str)
-        
-        lon_str = lon_str.replace(',', '.').replace('W', '').replace('E', '').replace('L', '').replace('O', '')
-        longitude = float(lon_str)
-        
-        if not (-90 <= latitude <= 90):
-            logger.error(f"Latitude fora do intervalo válido: {latitude}")
-            return None
-        if not (-180 <= longitude <= 180):
-            logger.error(f"Longitude fora do intervalo válido: {longitude}")
-            return None
-        
-        logger.info(f"Coordenadas processadas com sucesso: Latitude={latitude}, Longitude={longitude}")
-        return (latitude, longitude)
+def parse_coordinates_from_match(match: re.Match) -> tuple[float, float] | None:
+    """
+    Converte um match de COORD_RE (ex.: -6,6386S -51,9896W) em latitude e longitude.
+    O sinal vem do próprio texto; as letras de direção não são usadas porque
+    o padrão também aceita as leituras erradas que o OCR faz delas.
+    """
+    lat_int, lat_dec, lon_int, lon_dec = match.groups()
+    latitude = float(f"{lat_int}.{lat_dec}")
+    longitude = float(f"{lon_int}.{lon_dec}")
     
-    except ValueError as e:
-        logger.error(f"Erro ao converter coordenadas para números: {e}")
+    if not (-90 <= latitude <= 90):
+        logger.error("Latitude fora do intervalo válido: %s", latitude)
+        return None
+    if not (-180 <= longitude <= 180):
+        logger.error("Longitude fora do intervalo válido: %s", longitude)
         return None
+    
+    logger.info("Coordenadas processadas com sucesso: Latitude=%s, Longitude=%s", latitude, longitude)
+    return (latitude, longitude)
+
+def format_coordinates(latitude: float, longitude: float) -> str:
+    """Formata as coordenadas com 4 casas decimais para exibição."""
+    return "%.4f, %.4f" % (latitude, longitude)
 
 def find_datetime_in_text(text: str) -> datetime | None:
     """Busca por data e hora no texto."""
-    month_map = {
-        'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6, 
-        'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12
-    }
-
-    match1 = re.search(r'(\d{1,2})\s*(?:de\s*)?([a-z]{3,})\.?\s*(?:de\s*)?(\d{4})\s*.*?(\d{2}:\d{2}(?::\d{2})?)', text, re.IGNORECASE)
-    if match1:
-        logger.info("Padrão 1 ('DD de Mês de AAAA') encontrado!")
-        day, month_str, year, time_str = match1.groups()
-        month = month_map.get(month_str.lower()[:3])
-        if month:
-            try:
-                if len(time_str) == 5: time_str += ':00'
-                return datetime(int(year), month, int(day), int(time_str[:2]), int(time_str[3:5]), int(time_str[6:]))
-            except ValueError:
-                logger.error("Valores de data/hora inválidos no Padrão 1.")
-
-    match2 = re.search(r'(\d{2}/\d{2}/\d{4})\s*(\d{2}:\d{2}(?::\d{2})?)', text)
-    if match2:
-        logger.info("Padrão 2 ('DD/MM/AAAA') encontrado!")
-        date_str, time_str = match2.groups()
+    # Um candidato rejeitado pode ter engolido outra data com o '.*?' do padrão 1:
+    # a busca recomeça logo depois do início dele, não no fim (como no finditer)
+    pos = 0
+    while (match := DATETIME_RE.search(text, pos)) is not None:
+        pos = match.start() + 1
+        if match['month']:
+            logger.info("Padrão 1 ('DD de Mês de AAAA') encontrado!")
+            month = MONTH_MAP.get(match['month'].lower()[:3])
+            if not month:
+                continue
+            year, day, hour, minute, second = match.group('year', 'day', 'hour', 'minute', 'second')
+        else:
+            logger.info("Padrão 2 ('DD/MM/AAAA') encontrado!")
+            year, month, day, hour, minute, second = match.group('year2', 'month2', 'day2', 'hour2', 'minute2', 'second2')
+        
+        # Os grupos já são os campos numéricos: sem strptime nem remontagem do horário
         try:
-            if len(time_str) == 5: time_str += ':00'
-            return datetime.strptime(f"{date_str} {time_str}", '%d/%m/%Y %H:%M:%S')
+            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
         except ValueError:
-            logger.error("Formato de data/hora inválido para DD/MM/AAAA.")
+            logger.error("Valores de data/hora inválidos: %s", match.group(0))
 
     logger.info("Nenhum padrão de data/hora conhecido foi encontrado no texto.")
     return None
 
-def extract_data_from_image(image_path: str, max_retries: int = 2) -> tuple[datetime | None, str | None, float | None, float | None, list[str]]:
+def _dms_to_decimal(dms: tuple, ref: str) -> float:
+    """Converte graus/minutos/segundos do EXIF para graus decimais."""
+    degrees, minutes, seconds = (float(v) for v in dms)
+    decimal = degrees + minutes / 60 + seconds / 3600
+    return -decimal if ref in ('S', 'W') else decimal
+
+def _exif_text(value) -> str:
+    """Decodifica um campo de texto do EXIF (UserComment traz 8 bytes de charset)."""
+    if isinstance(value, bytes):
+        charset, value = value[:8], value[8:]
+        value = value.decode('utf-16' if charset.startswith(b'UNICODE') else 'utf-8', errors='ignore')
+    return str(value).strip('\x00 ')
+
+def extract_data_from_exif(img: Image.Image) -> tuple[datetime | None, str | None, float | None, float | None, list[str]] | None:
+    """
+    Lê data/hora, coordenadas e tags de cliente dos metadados EXIF da imagem.
+    As tags só são procuradas nos campos de texto (UserComment, ImageDescription).
+    Retorna None se faltar a data/hora ou as coordenadas.
+    """
+    try:
+        exif = img.getexif()
+        gps = exif.get_ifd(IFD.GPSInfo)
+        if not all(k in gps for k in (GPS.GPSLatitudeRef, GPS.GPSLatitude, GPS.GPSLongitudeRef, GPS.GPSLongitude)):
+            return None
+        
+        latitude = _dms_to_decimal(gps[GPS.GPSLatitude], gps[GPS.GPSLatitudeRef])
+        longitude = _dms_to_decimal(gps[GPS.GPSLongitude], gps[GPS.GPSLongitudeRef])
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            logger.warning("Coordenadas EXIF fora do intervalo válido: %s, %s", latitude, longitude)
+            return None
+        
+        exif_ifd = exif.get_ifd(IFD.Exif)
+        # Só a hora da captura: o DateTime do IFD0 é a hora da última edição do
+        # arquivo; sem DateTimeOriginal, a data vem do carimbo pelo OCR
+        dt_str = exif_ifd.get(Base.DateTimeOriginal)
+        if not dt_str:
+            return None
+        dt_object = datetime.strptime(_exif_text(dt_str), '%Y:%m:%d %H:%M:%S')
+        
+        tags = []
+        for value in (exif_ifd.get(Base.UserComment), exif.get(Base.ImageDescription)):
+            if value:
+                tags += extract_client_tag(_exif_text(value))
+    except Exception as e:
+        logger.warning("Erro ao ler metadados EXIF: %s", e)
+        return None
+    
+    coords_str = format_coordinates(latitude, longitude)
+    logger.info("Dados extraídos do EXIF: %s, %s, tags=%s", dt_object, coords_str, tags)
+    return dt_object, coords_str, latitude, longitude, tags
+
+def extract_data_from_image(image_bytes: bytes, max_retries: int = 2) -> tuple[datetime | None, str | None, float | None, float | None, list[str]]:
     """
     Extrai data/hora, coordenadas e tags de cliente da imagem com retry.
+    Quando o EXIF já traz data/hora e coordenadas, o OCR só lê a faixa do
+    carimbo em busca da tag #Oia; se o EXIF também traz a tag, não há OCR.
     
     Returns:
         Tupla (dt_object, coords_str, latitude, longitude, tags)
@@ -433,44 +819,97 @@ def extract_data_from_image(image_path: str, max_retries: int = 2) -> tuple[date
     longitude = None
     tags = []
     
-    for attempt in range(max_retries + 1):
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except Exception as e:
+        logger.error("Erro ao abrir a imagem: %s", e)
+        return dt_object, coords_str, latitude, longitude, tags
+    
+    exif_data = extract_data_from_exif(img)
+    if exif_data and exif_data[4]:
+        return exif_data
+    # A tag #Oia é escrita no carimbo e os apps de câmera não a copiam para o
+    # EXIF: com data e coordenadas do EXIF, basta a tentativa da faixa do carimbo
+    attempts = OCR_ATTEMPTS[:1] if exif_data else OCR_ATTEMPTS[:max_retries + 1]
+    
+    # A imagem é preparada e entregue ao Tesseract uma única vez; as tentativas
+    # só mudam o retângulo lido e o modo de segmentação (ver OCR_ATTEMPTS).
+    # A API é do processo e atende várias fotos: ela é sempre limpa no fim, e
+    # sem a imagem carregada não há tentativa, para não ler a foto anterior.
+    try:
+        image = preprocess_image_for_ocr(img)
+        set_ocr_image(image)
+    except Exception as e:
+        logger.error("Erro ao preparar a imagem para o OCR: %s", e)
+        clear_ocr_image()
+        return exif_data or (dt_object, coords_str, latitude, longitude, tags)
+    
+    try:
+        dt_object, coords_str, latitude, longitude, tags = run_ocr_attempts(image, attempts)
+    finally:
+        clear_ocr_image()
+    
+    if exif_data:
+        # Data e coordenadas do EXIF são exatas; do OCR vem só a tag
+        dt_object, coords_str, latitude, longitude, _ = exif_data
+    return dt_object, coords_str, latitude, longitude, tags
+
+def run_ocr_attempts(image: Image.Image, attempts: tuple) -> tuple[datetime | None, str | None, float | None, float | None, list[str]]:
+    """
+    Executa as tentativas de OCR sobre a imagem já carregada no Tesseract.
+    
+    Returns:
+        Tupla (dt_object, coords_str, latitude, longitude, tags)
+    """
+    dt_object = None
+    coords_str = None
+    latitude = None
+    longitude = None
+    tags = []
+    
+    for attempt, (only_overlay, psm) in enumerate(attempts):
         try:
-            logger.info(f"Tentativa {attempt + 1} de {max_retries + 1}")
+            logger.info("Tentativa %s de %s", attempt + 1, len(attempts))
             
-            processed_image = preprocess_image_for_ocr(image_path)
-            raw_text = pytesseract.image_to_string(processed_image, lang='por+eng')
-            logger.info(f"Texto extraído (bruto) - Tentativa {attempt + 1}:\n---\n{raw_text}\n---")
+            rect = overlay_band_rect(image) if only_overlay else (0, 0, image.width, image.height)
+            raw_text = extract_text_from_image(rect, psm)
+            logger.debug("Texto extraído (bruto) - Tentativa %s:\n---\n%s\n---", attempt + 1, raw_text)
 
             cleaned_text = clean_ocr_text(raw_text)
-            logger.info(f"Texto limpo - Tentativa {attempt + 1}:\n---\n{cleaned_text}\n---")
+            logger.debug("Texto limpo - Tentativa %s:\n---\n%s\n---", attempt + 1, cleaned_text)
             
             # Procura por data/hora
-            dt_object = find_datetime_in_text(cleaned_text)
+            dt_object = find_datetime_in_text(cleaned_text) or dt_object
             
             # Procura por tags de cliente
-            tags = extract_client_tag(cleaned_text)
+            tags = extract_client_tag(cleaned_text) or tags
             
-            # Procura por coordenadas
-            coords_match = re.search(r'(-?\d+[\.,]\d+[NSns])\s+(-?\d+[\.,]\d+[EWLOwvloe])', cleaned_text, re.IGNORECASE)
+            # Procura por coordenadas (só roda a regex se houver letra de hemisfério)
+            coords_match = None
+            if not COORD_HEMISPHERE_CHARS.isdisjoint(cleaned_text):
+                coords_match = COORD_RE.search(cleaned_text)
             if coords_match:
-                coords_str_raw = f"{coords_match.group(1)} {coords_match.group(2)}"
-                logger.info(f"Coordenadas GPS encontradas (bruto) - Tentativa {attempt + 1}: {coords_str_raw}")
+                logger.info("Coordenadas GPS encontradas (bruto) - Tentativa %s: %s", attempt + 1, coords_match.group(0))
                 
-                parsed_coords = parse_coordinates(coords_str_raw)
+                parsed_coords = parse_coordinates_from_match(coords_match)
                 if parsed_coords:
                     latitude, longitude = parsed_coords
-                    coords_str = f"{latitude:.4f}, {longitude:.4f}"
-                    logger.info(f"Coordenadas processadas com sucesso na tentativa {attempt + 1}")
-                    break
+                    coords_str = format_coordinates(latitude, longitude)
+                    logger.info("Coordenadas processadas com sucesso na tentativa %s", attempt + 1)
+                    # A linha da data pode ficar acima da faixa: só a faixa com
+                    # data e coordenadas dispensa a leitura da imagem inteira
+                    if dt_object or not only_overlay:
+                        break
             
-            if dt_object or coords_str or tags:
-                logger.info(f"Dados extraídos com sucesso na tentativa {attempt + 1}")
+            # Sem data e coordenadas na faixa do carimbo, tenta de novo com a imagem inteira
+            if (dt_object or coords_str or tags) and not only_overlay:
+                logger.info("Dados extraídos com sucesso na tentativa %s", attempt + 1)
                 break
         
         except Exception as e:
-            logger.error(f"Erro na tentativa {attempt + 1}: {e}")
-            if attempt < max_retries:
-                logger.info(f"Tentando novamente...")
+            logger.error("Erro na tentativa %s: %s", attempt + 1, e)
+            if attempt < len(attempts) - 1:
+                logger.info("Tentando novamente...")
             continue
     
     return dt_object, coords_str, latitude, longitude, tags
@@ -491,18 +930,56 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "As coordenadas serão armazenadas e um mapa será gerado automaticamente no grupo 'FDA Relatorios'."
     )
 
+async def extract_data_from_media(media) -> tuple[datetime | None, str | None, float | None, float | None, list[str]]:
+    """
+    Baixa a foto (PhotoSize ou Document) e extrai os dados, reaproveitando o cache de OCR.
+    Fotos encaminhadas mantêm o file_unique_id, o que dispensa até o download;
+    o mesmo arquivo reenviado por outro caminho é reconhecido pelo hash do conteúdo.
+    """
+    global OCR_EXECUTOR
+    result = get_cached_ocr_result(media.file_unique_id)
+    if result is not None:
+        logger.info("Resultado de OCR reaproveitado do cache (file_unique_id)")
+        return result
+    
+    file = await media.get_file()
+    # A foto é baixada direto para a memória, sem passar pelo disco
+    image_bytes = bytes(await file.download_as_bytearray())
+    image_key = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+    
+    result = get_cached_ocr_result(image_key)
+    if result is not None:
+        logger.info("Resultado de OCR reaproveitado do cache")
+    else:
+        # Extrai dados com retry no pool de OCR, sem bloquear o event loop
+        executor = OCR_EXECUTOR
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                executor, extract_data_from_image, image_bytes, 2
+            )
+        except BrokenProcessPool:
+            # Um processo de OCR morreu (ex.: falta de memória) e o pool não se
+            # recupera sozinho: é trocado por um novo para as próximas fotos
+            logger.error("Pool de OCR quebrado, recriando os processos")
+            if OCR_EXECUTOR is executor:
+                OCR_EXECUTOR = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_init_ocr_worker)
+                executor.shutdown(wait=False)
+            # Só esta foto falha (handle_photo responde com o erro)
+            raise
+    
+    if any(result):
+        cache_ocr_result(image_key, result)
+        cache_ocr_result(media.file_unique_id, result)
+    return result
+
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handler para fotos enviadas ao bot."""
     if not (update.message.photo or update.message.document):
         return
 
-    if update.message.photo:
-        file = await update.message.photo[-1].get_file()
-    else:
-        file = await update.message.document.get_file()
+    media = update.message.photo[-1] if update.message.photo else update.message.document
 
-    file_path = f"temp_{file.file_id}.jpg"
-    
     dt_object = None
     coords_str = None
     latitude = None
@@ -510,13 +987,11 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     tags = []
     cliente_definido = None
     is_duplicate = False
+    adicionada = False
     ignorada = False
 
     try:
-        await file.download_to_drive(file_path)
-        
-        # Extrai dados com retry
-        dt_object, coords_str, latitude, longitude, tags = extract_data_from_image(file_path, max_retries=2)
+        dt_object, coords_str, latitude, longitude, tags = await extract_data_from_media(media)
 
         # Hierarquia de definição de cliente
         if len(tags) == 1:
@@ -524,13 +999,13 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             tag_cliente = f"Oia {tags[0]}"
             if tag_cliente in CLIENTES_OURILANDIA:
                 cliente_definido = tag_cliente
-                logger.info(f"Cliente definido por tag: {cliente_definido}")
+                logger.info("Cliente definido por tag: %s", cliente_definido)
             else:
-                logger.warning(f"Tag inválido: {tag_cliente}")
+                logger.warning("Tag inválido: %s", tag_cliente)
                 ignorada = True
         elif len(tags) > 1:
             # Mais de 1 tag: use as coordenadas
-            logger.warning(f"Múltiplos tags encontrados: {tags}. Usando coordenadas para definir cliente.")
+            logger.warning("Múltiplos tags encontrados: %s. Usando coordenadas para definir cliente.", tags)
             if latitude and longitude:
                 cliente_definido = find_cliente_by_geofence(latitude, longitude)
         else:
@@ -540,21 +1015,21 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
         # Se encontrou coordenadas e cliente, adiciona à lista
         if coords_str and cliente_definido and dt_object and not ignorada:
-            timestamp = dt_object.strftime('%d/%m/%Y %H:%M:%S')
+            # Gravado em ISO 8601; o formato brasileiro fica só para exibição
+            timestamp = dt_object.isoformat(timespec='seconds')
             
-            if not add_coordinate(latitude, longitude, timestamp, cliente_definido):
+            if add_coordinate(latitude, longitude, timestamp, cliente_definido):
+                adicionada = True
+            else:
                 is_duplicate = True
                 logger.info("Foto duplicada ignorada")
 
     except Exception as e:
-        logger.error(f"Erro ao processar a imagem: {e}")
+        logger.error("Erro ao processar a imagem: %s", e)
         import traceback
         traceback.print_exc()
         await update.message.reply_text("❌ Ocorreu um erro ao tentar processar esta imagem.")
         return
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
     # Prepara resposta
     if ignorada:
@@ -572,8 +1047,8 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             
     await update.message.reply_text(reply_text)
     
-    # Se encontrou tudo, agenda geração de mapa
-    if cliente_definido and coords_str and not is_duplicate and not ignorada:
+    # Só agenda o mapa se entrou uma coordenada nova; sem ela o mapa não muda
+    if adicionada:
         logger.info("Agendando geração de mapa com delay de 60 segundos...")
         await schedule_map_generation(context, delay=60)
         
@@ -586,6 +1061,26 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         except:
             pass
 
+async def post_init(application: Application) -> None:
+    """Executado antes do bot começar a receber mensagens."""
+    loop = asyncio.get_running_loop()
+    # A partir do Python 3.12, tarefas começam a rodar na hora e só vão para a
+    # fila do event loop se precisarem esperar; em versões anteriores não há essa opção
+    if hasattr(asyncio, "eager_task_factory"):
+        loop.set_task_factory(asyncio.eager_task_factory)
+        logger.info("Usando eager_task_factory no event loop")
+    
+    # Sobe o pool de OCR já na inicialização: o carregamento dos modelos do
+    # Tesseract acontece agora, em paralelo, e não no download da primeira foto
+    await asyncio.gather(*(
+        loop.run_in_executor(OCR_EXECUTOR, _ocr_worker_ready) for _ in range(OCR_WORKERS)
+    ))
+    logger.info("Pool de OCR pronto com %s processos", OCR_WORKERS)
+
+async def post_shutdown(application: Application) -> None:
+    """Executado quando o bot é desligado."""
+    save_ocr_cache()
+
 def main() -> None:
     """Função principal que inicia o bot."""
     token = os.environ.get("BOT_TOKEN")
@@ -594,7 +1089,28 @@ def main() -> None:
         return
 
     logger.info("🚀 Iniciando o bot...")
-    application = Application.builder().token(token).build()
+
+    # uvloop (libuv) reduz o custo de cada await; não existe no Windows
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Usando uvloop como event loop")
+    except ImportError:
+        logger.info("uvloop não está instalado, usando o event loop padrão do asyncio")
+    load_ocr_cache()
+    # Atualizações concorrentes: fotos enviadas juntas são processadas em paralelo no pool de OCR.
+    # HTTP/2 multiplexa os downloads das fotos numa única conexão TLS com a API do Telegram.
+    application = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(True)
+        .http_version("2")
+        .read_timeout(30)
+        .get_updates_http_version("2")
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.PHOTO | filters.Document.IMAGE, handle_photo))